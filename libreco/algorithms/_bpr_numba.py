@@ -0,0 +1,254 @@
+"""
+
+Numba version of the BPR update, used when the cython extension `_bpr`
+is not compiled. The kernels mirror the ones in `_bpr.pyx`.
+
+"""
+import numpy as np
+from numba import config, get_num_threads, njit, prange, set_num_threads
+from ..utils.misc import shuffle_data
+from ..utils._sampling_numba import _check_consumed, _random_item, _splitmix64
+
+
+@njit(nogil=True, cache=True)
+def _sample_item_neg(indices, indptr, user, n_items, state):
+    start, end = indptr[user], indptr[user + 1]
+    state, item_neg = _random_item(state, n_items)
+    while _check_consumed(indices, start, end, item_neg):
+        state, item_neg = _random_item(state, n_items)
+    return item_neg
+
+
+def bpr_update(optimizer, train_data, user_embed, item_embed, lr, reg,
+               n_users, n_items, shuffle, num_threads, seed, epoch,
+               u_velocity=None, i_velocity=None, momentum=0.9,
+               u_1st_mom=None, i_1st_mom=None, u_2nd_mom=None,
+               i_2nd_mom=None, rho1=0.9, rho2=0.999):
+
+    if train_data.has_sampled:
+        user_indices = train_data.user_indices_orig.astype(np.int32)
+        item_indices = train_data.item_indices_orig.astype(np.int32)
+    else:
+        user_indices = train_data.user_indices.astype(np.int32)
+        item_indices = train_data.item_indices.astype(np.int32)
+
+    sparse_interaction = train_data.sparse_interaction
+    # consumed items are checked with binary search
+    if not sparse_interaction.has_sorted_indices:
+        sparse_interaction.sort_indices()
+    sparse_indices = sparse_interaction.indices
+    sparse_indptr = sparse_interaction.indptr
+
+    if not reg:
+        reg = 0.0
+
+    if shuffle:
+        user_indices, item_indices = shuffle_data(
+            len(user_indices), user_indices, item_indices)
+
+    # restore the thread count afterwards, otherwise it would also
+    # limit other numba functions called later in this thread
+    orig_num_threads = get_num_threads()
+    set_num_threads(max(1, min(num_threads, config.NUMBA_NUM_THREADS)))
+    # different seed for every epoch, otherwise same negative items
+    # would be sampled in each epoch
+    seed = seed + epoch
+    try:
+        if optimizer == "sgd":
+            _bpr_update_sgd(user_indices,
+                            item_indices,
+                            sparse_indices,
+                            sparse_indptr,
+                            user_embed,
+                            item_embed,
+                            lr,
+                            reg,
+                            n_items,
+                            seed)
+
+        elif optimizer == "momentum":
+            _bpr_update_momentum(user_indices,
+                                 item_indices,
+                                 sparse_indices,
+                                 sparse_indptr,
+                                 user_embed,
+                                 item_embed,
+                                 lr,
+                                 reg,
+                                 n_items,
+                                 u_velocity,
+                                 i_velocity,
+                                 momentum,
+                                 seed)
+
+        elif optimizer == "adam":
+            _bpr_update_adam(user_indices,
+                             item_indices,
+                             sparse_indices,
+                             sparse_indptr,
+                             user_embed,
+                             item_embed,
+                             lr,
+                             reg,
+                             n_items,
+                             u_1st_mom,
+                             i_1st_mom,
+                             u_2nd_mom,
+                             i_2nd_mom,
+                             rho1,
+                             rho2,
+                             epoch,
+                             seed)
+    finally:
+        set_num_threads(orig_num_threads)
+
+
+# Same as the cython version, parameters are updated in Hogwild! style,
+# i.e. without any lock between threads. Numba keeps a separate random
+# state for every thread, so seeding it outside the loop doesn't work.
+# Instead every sample derives its own random stream from the seed, so
+# the sampled negative items don't depend on how rows are scheduled.
+@njit(parallel=True, fastmath=True, nogil=True, cache=True)
+def _bpr_update_sgd(user_indices, item_indices, sparse_indices,
+                    sparse_indptr, user_embed, item_embed, lr, reg,
+                    n_items, seed):
+    embed_size = user_embed.shape[1] - 1
+    for i in prange(len(user_indices)):
+        user = user_indices[i]
+        item_pos = item_indices[i]
+        _, state = _splitmix64(np.uint64(seed) ^ np.uint64(i))
+        item_neg = _sample_item_neg(sparse_indices, sparse_indptr,
+                                    user, n_items, state)
+
+        item_diff = 0.0
+        for j in range(embed_size + 1):
+            item_diff += user_embed[user, j] * (
+                item_embed[item_pos, j] - item_embed[item_neg, j])
+        log_sigmoid_grad = 1.0 / (1.0 + np.exp(item_diff))
+
+        for j in range(embed_size):
+            user_grad = log_sigmoid_grad * (
+                item_embed[item_pos, j] - item_embed[item_neg, j]
+            ) - reg * user_embed[user, j]
+            item_pos_grad = (
+                log_sigmoid_grad * user_embed[user, j]
+                - reg * item_embed[item_pos, j]
+            )
+            item_neg_grad = (
+                - log_sigmoid_grad * user_embed[user, j]
+                - reg * item_embed[item_neg, j]
+            )
+
+            user_embed[user, j] += lr * user_grad
+            item_embed[item_pos, j] += lr * item_pos_grad
+            item_embed[item_neg, j] += lr * item_neg_grad
+
+        item_embed[item_pos, embed_size] += lr * (
+            log_sigmoid_grad - reg * item_embed[item_pos, embed_size])
+        item_embed[item_neg, embed_size] += lr * (
+            -log_sigmoid_grad - reg * item_embed[item_neg, embed_size])
+
+
+@njit(parallel=True, fastmath=True, nogil=True, cache=True)
+def _bpr_update_momentum(user_indices, item_indices, sparse_indices,
+                         sparse_indptr, user_embed, item_embed, lr, reg,
+                         n_items, u_velocity, i_velocity, momentum, seed):
+    embed_size = user_embed.shape[1] - 1
+    for i in prange(len(user_indices)):
+        user = user_indices[i]
+        item_pos = item_indices[i]
+        _, state = _splitmix64(np.uint64(seed) ^ np.uint64(i))
+        item_neg = _sample_item_neg(sparse_indices, sparse_indptr,
+                                    user, n_items, state)
+
+        item_diff = 0.0
+        for j in range(embed_size + 1):
+            item_diff += user_embed[user, j] * (
+                item_embed[item_pos, j] - item_embed[item_neg, j])
+        log_sigmoid_grad = 1.0 / (1.0 + np.exp(item_diff))
+
+        for j in range(embed_size + 1):
+            item_pos_grad = (
+                log_sigmoid_grad * user_embed[user, j]
+                - reg * item_embed[item_pos, j]
+            )
+            item_neg_grad = (
+                - log_sigmoid_grad * user_embed[user, j]
+                - reg * item_embed[item_neg, j]
+            )
+
+            if j < embed_size:
+                user_grad = log_sigmoid_grad * (
+                    item_embed[item_pos, j] - item_embed[item_neg, j]
+                ) - reg * user_embed[user, j]
+                u_velocity[user, j] = (
+                    momentum * u_velocity[user, j] + lr * user_grad)
+                user_embed[user, j] += u_velocity[user, j]
+
+            i_velocity[item_pos, j] = (
+                momentum * i_velocity[item_pos, j] + lr * item_pos_grad)
+            item_embed[item_pos, j] += i_velocity[item_pos, j]
+
+            i_velocity[item_neg, j] = (
+                momentum * i_velocity[item_neg, j] + lr * item_neg_grad)
+            item_embed[item_neg, j] += i_velocity[item_neg, j]
+
+
+@njit(parallel=True, fastmath=True, nogil=True, cache=True)
+def _bpr_update_adam(user_indices, item_indices, sparse_indices,
+                     sparse_indptr, user_embed, item_embed, lr, reg,
+                     n_items, u_1st_mom, i_1st_mom, u_2nd_mom, i_2nd_mom,
+                     rho1, rho2, epoch, seed):
+    embed_size = user_embed.shape[1] - 1
+    unbias_1st = 1.0 - rho1 ** epoch
+    unbias_2nd = 1.0 - rho2 ** epoch
+    for i in prange(len(user_indices)):
+        user = user_indices[i]
+        item_pos = item_indices[i]
+        _, state = _splitmix64(np.uint64(seed) ^ np.uint64(i))
+        item_neg = _sample_item_neg(sparse_indices, sparse_indptr,
+                                    user, n_items, state)
+
+        item_diff = 0.0
+        for j in range(embed_size + 1):
+            item_diff += user_embed[user, j] * (
+                item_embed[item_pos, j] - item_embed[item_neg, j])
+        log_sigmoid_grad = 1.0 / (1.0 + np.exp(item_diff))
+
+        for j in range(embed_size + 1):
+            item_pos_grad = (
+                log_sigmoid_grad * user_embed[user, j]
+                - reg * item_embed[item_pos, j]
+            )
+            item_neg_grad = (
+                - log_sigmoid_grad * user_embed[user, j]
+                - reg * item_embed[item_neg, j]
+            )
+
+            if j < embed_size:
+                user_grad = log_sigmoid_grad * (
+                    item_embed[item_pos, j] - item_embed[item_neg, j]
+                ) - reg * user_embed[user, j]
+                u_1st_mom[user, j] = rho1 * u_1st_mom[user, j] + (
+                    1.0 - rho1) * user_grad
+                u_2nd_mom[user, j] = rho2 * u_2nd_mom[user, j] + (
+                    1.0 - rho2) * user_grad ** 2
+                user_embed[user, j] += lr * (
+                    u_1st_mom[user, j] / unbias_1st) / (
+                    np.sqrt(u_2nd_mom[user, j] / unbias_2nd) + 1e-8)
+
+            i_1st_mom[item_pos, j] = rho1 * i_1st_mom[item_pos, j] + (
+                1.0 - rho1) * item_pos_grad
+            i_2nd_mom[item_pos, j] = rho2 * i_2nd_mom[item_pos, j] + (
+                1.0 - rho2) * item_pos_grad ** 2
+            item_embed[item_pos, j] += lr * (
+                i_1st_mom[item_pos, j] / unbias_1st) / (
+                np.sqrt(i_2nd_mom[item_pos, j] / unbias_2nd) + 1e-8)
+
+            i_1st_mom[item_neg, j] = rho1 * i_1st_mom[item_neg, j] + (
+                1.0 - rho1) * item_neg_grad
+            i_2nd_mom[item_neg, j] = rho2 * i_2nd_mom[item_neg, j] + (
+                1.0 - rho2) * item_neg_grad ** 2
+            item_embed[item_neg, j] += lr * (
+                i_1st_mom[item_neg, j] / unbias_1st) / (
+                np.sqrt(i_2nd_mom[item_neg, j] / unbias_2nd) + 1e-8)
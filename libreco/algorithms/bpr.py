@@ -10,9 +10,9 @@ from tensorflow.python.keras import backend as K
 from tensorflow.keras import backend as K
 import time
 import logging
-from itertools import islice
 from functools import partial
 import numpy as np
+from scipy.special import expit
 import tensorflow as tf2
 from tensorflow.keras.initializers import (
     zeros as tf_zeros,
@@ -28,8 +28,13 @@ try:
 except (ImportError, ModuleNotFoundError):
     LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
     logging.basicConfig(format=LOG_FORMAT)
-    logging.warning("BPR cython version is not available")
-    pass  # may use tf version, then raise error will fail
+    try:
+        from ._bpr_numba import bpr_update
+        logging.warning("BPR cython version is not available, "
+                        "use numba version instead")
+    except (ImportError, ModuleNotFoundError):
+        logging.warning("BPR cython version is not available")
+        pass  # may use tf version, then raise error will fail
 tf = tf2.compat.v1
 tf.disable_v2_behavior()
 
@@ -68,8 +73,10 @@ class BPR(Base, TfMixin, EvalMixin):
         self.use_tf = use_tf
         self.seed = seed
         self.user_consumed = data_info.user_consumed
+        self._user_consumed_sets = None
         self.user_embed = None
         self.item_embed = None
+        self.item_embed_T = None
 
         if use_tf:
             TfMixin.__init__(self)
@@ -88,6 +95,7 @@ class BPR(Base, TfMixin, EvalMixin):
         self.item_embed = truncated_normal(
             shape=(self.n_items, self.embed_size + 1), mean=0.0, scale=0.03)
         self.item_embed[:, self.embed_size] = 0.0
+        self._set_item_embed_T()
 
     def _build_model_tf(self):
         if isinstance(self.reg, float) and self.reg > 0.0:
@@ -135,10 +143,11 @@ class BPR(Base, TfMixin, EvalMixin):
                 tf.subtract(embed_item_pos, embed_item_neg)
             ), axis=1
         )
-        self.log_sigmoid = tf.log_sigmoid(item_diff)
+        self.item_diff = item_diff
 
     def _build_train_ops(self):
-        self.loss = -tf.reduce_mean(self.log_sigmoid)
+        # -log(sigmoid(x)) == softplus(-x), stable for large |x|
+        self.loss = tf.reduce_mean(tf.nn.softplus(-self.item_diff))
         if self.reg is not None:
             reg_keys = tf.get_collection(tf.GraphKeys.REGULARIZATION_LOSSES)
             total_loss = self.loss + tf.add_n(reg_keys)
@@ -152,6 +161,9 @@ class BPR(Base, TfMixin, EvalMixin):
     def fit(self, train_data, verbose=1, shuffle=True, num_threads=1,
             eval_data=None, metrics=None, optimizer="sgd"):
         self.show_start_time()
+        # constant time membership test when filtering recommendations
+        self._user_consumed_sets = {
+            u: frozenset(items) for u, items in self.user_consumed.items()}
         self._check_has_sampled(train_data, verbose)
 
         if self.use_tf:
@@ -212,9 +224,13 @@ class BPR(Base, TfMixin, EvalMixin):
                         epoch=epoch)
 
             if verbose > 1:
+                # item_embed is updated in place, so refresh the copy
+                self._set_item_embed_T()
                 self.print_metrics(eval_data=eval_data, metrics=metrics)
                 print("="*30)
 
+        self._set_item_embed_T()
+
     def _fit_tf(self, train_data, verbose=1, shuffle=True,
                 eval_data=None, metrics=None):
         data_generator = PairwiseSampling(train_data,
@@ -253,11 +269,10 @@ class BPR(Base, TfMixin, EvalMixin):
         )
         unknown_num, unknown_index, user, item = self._check_unknown(user, item)
 
-        preds = np.sum(
-            np.multiply(self.user_embed[user], self.item_embed[item]),
-            axis=1
+        preds = np.einsum(
+            "ij,ij->i", self.user_embed[user], self.item_embed[item]
         )
-        preds = 1 / (1 + np.exp(-preds))
+        preds = expit(preds)
 
         if unknown_num > 0:
             preds[unknown_index] = self.default_prediction
@@ -266,21 +281,62 @@ class BPR(Base, TfMixin, EvalMixin):
 
     def recommend_user(self, user, n_rec, **kwargs):
         user = self._check_unknown_user(user)
-        if not user:
+        if user is None:
             return   # popular ?
 
-        consumed = self.user_consumed[user]
+        consumed = self._user_consumed_sets[user]
         count = n_rec + len(consumed)
-        recos = self.user_embed[user] @ self.item_embed.T
-        recos = 1 / (1 + np.exp(-recos))
+        recos = self.user_embed[user] @ self.item_embed_T
 
+        # sigmoid is monotonic, so rank on raw scores and
+        # only convert the final recommendations to probabilities
         ids = np.argpartition(recos, -count)[-count:]
-        rank = sorted(zip(ids, recos[ids]), key=lambda x: -x[1])
-        return list(
-            islice(
-                (rec for rec in rank if rec[0] not in consumed), n_rec
-            )
-        )
+        ids = ids[np.argsort(-recos[ids])]
+        ids = [i for i in ids.tolist() if i not in consumed][:n_rec]
+        probs = expit(recos[ids])
+        return list(zip(ids, probs))
+
+    def recommend_users(self, users, n_rec, **kwargs):
+        """Recommend a list of items for each of the given users.
+
+        All users are scored in one matrix multiplication, which is much
+        faster than calling `recommend_user` repeatedly.
+
+        Parameters
+        ----------
+        users : array_like
+            User ids to recommend.
+        n_rec : int
+            number of recommendations to return for each user.
+
+        Returns
+        -------
+        result : dict
+            Mapping from user id to a recommendation list of
+            (item_id, score) tuples, unknown users map to None.
+        """
+        users = np.asarray(users)
+        known = (users >= 0) & (users < self.n_users)
+        result = {u: self.recommend_user(u, n_rec)
+                  for u in users[~known].tolist()}
+        users = users[known]
+        if len(users) == 0:
+            return result
+
+        consumed_sets = [self._user_consumed_sets[u] for u in users]
+        count = min(n_rec + max(map(len, consumed_sets)), self.n_items)
+        recos = self.user_embed[users] @ self.item_embed_T
+
+        ids = np.argpartition(recos, -count, axis=1)[:, -count:]
+        top_recos = np.take_along_axis(recos, ids, axis=1)
+        order = np.argsort(-top_recos, axis=1)
+        ids = np.take_along_axis(ids, order, axis=1)
+        top_probs = expit(np.take_along_axis(top_recos, order, axis=1))
+        for u, consumed, u_ids, u_probs in zip(
+                users.tolist(), consumed_sets, ids.tolist(), top_probs):
+            result[u] = [(i, p) for i, p in zip(u_ids, u_probs)
+                         if i not in consumed][:n_rec]
+        return result
 
     def _set_latent_factors(self):
         item_bias, user_embed, item_embed = self.sess.run(
@@ -293,3 +349,9 @@ class BPR(Base, TfMixin, EvalMixin):
         item_bias = item_bias[:, None]
         self.user_embed = np.hstack([user_embed, user_bias])
         self.item_embed = np.hstack([item_embed, item_bias])
+        self._set_item_embed_T()
+
+    def _set_item_embed_T(self):
+        # contiguous (embed_size + 1, n_items) copy of item_embed,
+        # so scoring all items is a unit-stride matrix-vector product
+        self.item_embed_T = np.ascontiguousarray(self.item_embed.T)
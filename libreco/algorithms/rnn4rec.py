@@ -130,7 +130,7 @@ class RNN4Rec(Base, TfMixin, EvalMixin):
                     tf.subtract(item_embed_pos, item_embed_neg)
                 ), axis=1
             )
-            self.log_sigmoid = tf.log_sigmoid(item_diff)
+            self.item_diff = item_diff
 
         count_params()
 
@@ -235,7 +235,8 @@ class RNN4Rec(Base, TfMixin, EvalMixin):
                                                         logits=self.output)
             )
         elif self.task == "ranking" and self.loss_type == "bpr":
-            self.loss = -tf.reduce_mean(self.log_sigmoid)
+            # -log(sigmoid(x)) == softplus(-x), stable for large |x|
+            self.loss = tf.reduce_mean(tf.nn.softplus(-self.item_diff))
 
         if self.reg is not None:
             reg_keys = tf.get_collection(tf.GraphKeys.REGULARIZATION_LOSSES)
@@ -6,8 +6,8 @@ Reference: Paul Covington et al.  "Deep Neural Networks for YouTube Recommendati
 author: massquantity
 
 """
-from itertools import islice
 import numpy as np
+from scipy.special import expit
 import tensorflow as tf2
 from tensorflow.keras.initializers import (
     truncated_normal as tf_truncated_normal
@@ -80,6 +80,7 @@ class YouTubeRanking(Base, TfMixin, EvalMixin):
         ) = self._check_interaction_mode(recent_num, random_num)
         self.seed = seed
         self.user_consumed = data_info.user_consumed
+        self._user_consumed_sets = None
         self.sparse = self._decide_sparse_indices(data_info)
         self.dense = self._decide_dense_values(data_info)
         if self.sparse:
@@ -90,14 +91,20 @@ class YouTubeRanking(Base, TfMixin, EvalMixin):
         self.user_last_interacted = None
         self.last_interacted_len = None
 
-    def _build_model(self):
+    def _build_model(self, inputs):
+        # During training, model inputs come from the data pipeline.
+        # They can still be fed explicitly for predicting and recommending.
         tf.set_random_seed(self.seed)
-        self.user_indices = tf.placeholder(tf.int32, shape=[None])
-        self.item_indices = tf.placeholder(tf.int32, shape=[None])
-        self.user_interacted_seq = tf.placeholder(
-            tf.int32, shape=[None, self.interaction_num])
-        self.user_interacted_len = tf.placeholder(tf.float32, shape=[None])
-        self.labels = tf.placeholder(tf.float32, shape=[None])
+        self.user_indices = tf.placeholder_with_default(
+            inputs["user_indices"], shape=[None])
+        self.item_indices = tf.placeholder_with_default(
+            inputs["item_indices"], shape=[None])
+        self.user_interacted_seq = tf.placeholder_with_default(
+            inputs["user_interacted_seq"], shape=[None, self.interaction_num])
+        self.user_interacted_len = tf.placeholder_with_default(
+            inputs["user_interacted_len"], shape=[None])
+        self.labels = tf.placeholder_with_default(
+            inputs["labels"], shape=[None])
         self.is_training = tf.placeholder_with_default(False, shape=[])
         self.concat_embed = []
 
@@ -108,29 +115,24 @@ class YouTubeRanking(Base, TfMixin, EvalMixin):
             regularizer=self.reg)
         item_features = tf.get_variable(
             name="item_features",
-            shape=[self.n_items + 1, self.embed_size],
+            shape=[self.n_items, self.embed_size],
             initializer=tf_truncated_normal(0.0, 0.01),
             regularizer=self.reg)
         user_embed = tf.nn.embedding_lookup(user_features, self.user_indices)
         item_embed = tf.nn.embedding_lookup(item_features, self.item_indices)
 
-        # unknown items are padded to 0-vector
-        zero_padding_op = tf.scatter_update(
-            item_features, self.n_items,
-            tf.zeros([self.embed_size], dtype=tf.float32)
-        )
-        with tf.control_dependencies([zero_padding_op]):
-            multi_item_embed = tf.nn.embedding_lookup(
-                item_features, self.user_interacted_seq)  # B * seq * K
-        pooled_embed = tf.div_no_nan(
-            tf.reduce_sum(multi_item_embed, axis=1),
-            tf.expand_dims(tf.sqrt(self.user_interacted_len), axis=1))
+        # Only non-padding items in the interacted sequence are looked up,
+        # and gather + sum + divide by sqrt(len) are fused in one sparse
+        # segment op. Users without history get an all-zero vector.
+        interacted_ids = self._interacted_sparse_ids(self.user_interacted_seq)
+        pooled_embed = tf.nn.safe_embedding_lookup_sparse(
+            item_features, interacted_ids, None, combiner="sqrtn")
         self.concat_embed.extend([user_embed, item_embed, pooled_embed])
 
         if self.sparse:
-            self._build_sparse()
+            self._build_sparse(inputs)
         if self.dense:
-            self._build_dense()
+            self._build_dense(inputs)
 
         concat_embed = tf.concat(self.concat_embed, axis=1)
         mlp_layer = dense_nn(concat_embed,
@@ -141,9 +143,16 @@ class YouTubeRanking(Base, TfMixin, EvalMixin):
         self.output = tf.reshape(
             tf.layers.dense(inputs=mlp_layer, units=1), [-1])
 
-    def _build_sparse(self):
-        self.sparse_indices = tf.placeholder(
-            tf.int32, shape=[None, self.sparse_field_size])
+    def _interacted_sparse_ids(self, interacted_seq):
+        # padding index is n_items
+        indices = tf.where(tf.less(interacted_seq, self.n_items))
+        values = tf.gather_nd(interacted_seq, indices)
+        dense_shape = tf.shape(interacted_seq, out_type=tf.int64)
+        return tf.SparseTensor(indices, values, dense_shape)
+
+    def _build_sparse(self, inputs):
+        self.sparse_indices = tf.placeholder_with_default(
+            inputs["sparse_indices"], shape=[None, self.sparse_field_size])
         sparse_features = tf.get_variable(
             name="sparse_features",
             shape=[self.sparse_feature_size, self.embed_size],
@@ -156,12 +165,11 @@ class YouTubeRanking(Base, TfMixin, EvalMixin):
             sparse_embed, [-1, self.sparse_field_size * self.embed_size])
         self.concat_embed.append(sparse_embed)
 
-    def _build_dense(self):
-        self.dense_values = tf.placeholder(
-            tf.float32, shape=[None, self.dense_field_size])
+    def _build_dense(self, inputs):
+        self.dense_values = tf.placeholder_with_default(
+            inputs["dense_values"], shape=[None, self.dense_field_size])
         dense_values_reshape = tf.reshape(
             self.dense_values, [-1, self.dense_field_size, 1])
-        batch_size = tf.shape(self.dense_values)[0]
 
         dense_features = tf.get_variable(
             name="dense_features",
@@ -169,14 +177,62 @@ class YouTubeRanking(Base, TfMixin, EvalMixin):
             initializer=tf_truncated_normal(0.0, 0.01),
             regularizer=self.reg)
 
-        dense_embed = tf.tile(dense_features, [batch_size, 1])
-        dense_embed = tf.reshape(
-            dense_embed, [-1, self.dense_field_size, self.embed_size])
-        dense_embed = tf.multiply(dense_embed, dense_values_reshape)
+        # broadcast the feature table against the values directly,
+        # so no B * F * K tiled copy of the table is materialized
+        dense_embed = tf.multiply(dense_values_reshape, dense_features)
         dense_embed = tf.reshape(
             dense_embed, [-1, self.dense_field_size * self.embed_size])
         self.concat_embed.append(dense_embed)
 
+    def _build_data_pipeline(self, data_generator, shuffle):
+        output_types = {
+            "user_interacted_seq": tf.int32,
+            "user_interacted_len": tf.float32,
+            "user_indices": tf.int32,
+            "item_indices": tf.int32,
+            "labels": tf.float32
+        }
+        output_shapes = {
+            "user_interacted_seq": tf.TensorShape(
+                [None, self.interaction_num]),
+            "user_interacted_len": tf.TensorShape([None]),
+            "user_indices": tf.TensorShape([None]),
+            "item_indices": tf.TensorShape([None]),
+            "labels": tf.TensorShape([None])
+        }
+        if self.sparse:
+            output_types["sparse_indices"] = tf.int32
+            output_shapes["sparse_indices"] = tf.TensorShape(
+                [None, self.sparse_field_size])
+        if self.dense:
+            output_types["dense_values"] = tf.float32
+            output_shapes["dense_values"] = tf.TensorShape(
+                [None, self.dense_field_size])
+
+        def batch_generator():
+            for (u_seq, u_len, user, item, label, sparse_idx, dense_val
+                 ) in data_generator(shuffle, self.batch_size):
+                batch = {
+                    "user_interacted_seq": u_seq,
+                    "user_interacted_len": u_len,
+                    "user_indices": user,
+                    "item_indices": item,
+                    "labels": label
+                }
+                if self.sparse:
+                    batch["sparse_indices"] = sparse_idx
+                if self.dense:
+                    batch["dense_values"] = dense_val
+                yield batch
+
+        # batches are prepared in background and prefetched, so training
+        # steps no longer wait for python-side batch generation and feeding
+        dataset = tf.data.Dataset.from_generator(
+            batch_generator, output_types, output_shapes
+        ).prefetch(tf.data.experimental.AUTOTUNE)
+        self.data_iterator = tf.data.make_initializable_iterator(dataset)
+        return self.data_iterator.get_next()
+
     def _build_train_ops(self, global_steps=None):
         self.loss = tf.reduce_mean(
             tf.nn.sigmoid_cross_entropy_with_logits(labels=self.labels,
@@ -200,6 +256,9 @@ class YouTubeRanking(Base, TfMixin, EvalMixin):
         assert self.task == "ranking", (
             "YouTube models is only suitable for ranking")
         self.show_start_time()
+        # constant time membership test when filtering recommendations
+        self._user_consumed_sets = {
+            u: frozenset(items) for u, items in self.user_consumed.items()}
         if self.lr_decay:
             n_batches = int(len(train_data) / self.batch_size)
             self.lr, global_steps = lr_decay_config(self.lr, n_batches,
@@ -207,28 +266,35 @@ class YouTubeRanking(Base, TfMixin, EvalMixin):
         else:
             global_steps = None
 
-        self._build_model()
-        self._build_train_ops(global_steps)
-
         data_generator = DataGenSequence(train_data, self.data_info,
                                          self.sparse, self.dense,
                                          mode=self.interaction_mode,
                                          num=self.interaction_num,
                                          padding_idx=self.n_items)
+        inputs = self._build_data_pipeline(data_generator, shuffle)
+        self._build_model(inputs)
+        self._build_train_ops(global_steps)
+
         for epoch in range(1, self.n_epochs + 1):
+            # fetch the decayed learning rate in the same run
+            # that resets the data pipeline for this epoch
             if self.lr_decay:
+                _, current_lr = self.sess.run(
+                    [self.data_iterator.initializer, self.lr])
                 print(f"With lr_decay, epoch {epoch} learning rate: "
-                      f"{self.sess.run(self.lr)}")
+                      f"{current_lr}")
+            else:
+                self.sess.run(self.data_iterator.initializer)
             with time_block(f"Epoch {epoch}", verbose):
                 train_total_loss = []
-                for (u_seq, u_len, user, item, label, sparse_idx, dense_val
-                     ) in data_generator(shuffle, self.batch_size):
-                    feed_dict = self._get_seq_feed_dict(
-                        u_seq, u_len, user, item, label,
-                        sparse_idx, dense_val, True)
-                    train_loss, _ = self.sess.run(
-                        [self.loss, self.training_op], feed_dict)
-                    train_total_loss.append(train_loss)
+                while True:
+                    try:
+                        train_loss, _ = self.sess.run(
+                            [self.loss, self.training_op],
+                            {self.is_training: True})
+                        train_total_loss.append(train_loss)
+                    except tf.errors.OutOfRangeError:
+                        break
 
             if verbose > 1:
                 train_loss_str = "train_loss: " + str(
@@ -268,7 +334,7 @@ class YouTubeRanking(Base, TfMixin, EvalMixin):
                                             dense_values, False)
 
         preds = self.sess.run(self.output, feed_dict)
-        preds = 1 / (1 + np.exp(-preds))
+        preds = expit(preds)
         if unknown_num > 0:
             preds[unknown_index] = self.default_prediction
 
@@ -284,25 +350,26 @@ class YouTubeRanking(Base, TfMixin, EvalMixin):
          sparse_indices,
          dense_values) = get_recommend_indices_and_values(
             self.data_info, user, self.n_items, self.sparse, self.dense)
-        u_last_interacted = np.tile(self.user_last_interacted[user],
-                                    (self.n_items, 1))
-        u_interacted_len = np.repeat(self.last_interacted_len[user],
-                                     self.n_items)
+        # read-only broadcast views, the same row is shared by all items
+        u_last_interacted = np.broadcast_to(
+            self.user_last_interacted[user],
+            (self.n_items, self.interaction_num))
+        u_interacted_len = np.broadcast_to(
+            self.last_interacted_len[user], (self.n_items,))
         feed_dict = self._get_seq_feed_dict(u_last_interacted, u_interacted_len,
                                             user_indices, item_indices, None,
                                             sparse_indices, dense_values, False)
 
         recos = self.sess.run(self.output, feed_dict)
-        recos = 1 / (1 + np.exp(-recos))
-        consumed = self.user_consumed[user]
+        consumed = self._user_consumed_sets[user]
         count = n_rec + len(consumed)
+        # sigmoid is monotonic, so rank on raw scores and
+        # only convert the final recommendations to probabilities
         ids = np.argpartition(recos, -count)[-count:]
-        rank = sorted(zip(ids, recos[ids]), key=lambda x: -x[1])
-        return list(
-            islice(
-                (rec for rec in rank if rec[0] not in consumed), n_rec
-            )
-        )
+        ids = ids[np.argsort(-recos[ids])]
+        ids = [i for i in ids.tolist() if i not in consumed][:n_rec]
+        probs = expit(recos[ids])
+        return list(zip(ids, probs))
 
     def _set_last_interacted(self):
         if (self.user_last_interacted is None
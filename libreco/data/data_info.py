@@ -32,6 +32,9 @@ class DataInfo(object):
         self._item2id = None
         self._id2user = None
         self._id2item = None
+        self._sparse_col_pos = None
+        self._dense_col_pos = None
+        self._item_popularity = None
 
     @staticmethod
     def interaction_consumed(user_indices, item_indices):
@@ -107,6 +110,28 @@ class DataInfo(object):
             index=list(self.col_name_mapping["item_dense_col"].values())
         )
 
+    @staticmethod
+    def column_positions(user_col, item_col):
+        # Merged features keep columns in original order, so each user and
+        # item column is placed at its rank among all of them, i.e. the
+        # inverse permutation of `argsort(user_col + item_col)`.
+        col_pos = np.argsort(np.argsort(user_col + item_col))
+        return col_pos[:len(user_col)], col_pos[len(user_col):]
+
+    @property
+    def sparse_col_pos(self):
+        if self._sparse_col_pos is None:
+            self._sparse_col_pos = DataInfo.column_positions(
+                self.user_sparse_col.index, self.item_sparse_col.index)
+        return self._sparse_col_pos
+
+    @property
+    def dense_col_pos(self):
+        if self._dense_col_pos is None:
+            self._dense_col_pos = DataInfo.column_positions(
+                self.user_dense_col.index, self.item_dense_col.index)
+        return self._dense_col_pos
+
     @property
     def user_col(self):
         # will be sorted by key
@@ -131,6 +156,16 @@ class DataInfo(object):
     def n_items(self):
         return self.interaction_data.item.nunique()
 
+    @property
+    def item_popularity(self):
+        # number of train interactions of every item
+        if self._item_popularity is None:
+            popularity = np.zeros(self.n_items, dtype=np.int64)
+            for i, users in self.item_consumed.items():
+                popularity[i] = len(users)
+            self._item_popularity = popularity
+        return self._item_popularity
+
     @property
     def user2id(self):
         if self._user2id is None:
@@ -1,4 +1,3 @@
-import itertools
 import numpy as np
 import pandas as pd
 
@@ -74,20 +73,30 @@ class Dataset(object):
     def _set_sparse_unique_vals(cls, train_data):
         if cls.sparse_col:
             for col in cls.sparse_col:
-                cls.sparse_unique_vals[col] = np.unique(train_data[col])
+                cls.sparse_unique_vals[col] = cls._sorted_unique(
+                    train_data[col].to_numpy()
+                )
 
         if cls.multi_sparse_col:
             for field in cls.multi_sparse_col:
                 # use name of a field's first column as representative
-                cls.multi_sparse_unique_vals[field[0]] = sorted(
-                    set(
-                        itertools.chain.from_iterable(
-                            train_data[field].to_numpy().T)
-                    )
+                cls.multi_sparse_unique_vals[field[0]] = cls._sorted_unique(
+                    train_data[field].to_numpy().ravel()
                 )
 
-        cls.user_unique_vals = np.unique(train_data["user"])
-        cls.item_unique_vals = np.unique(train_data["item"])
+        cls.user_unique_vals = cls._sorted_unique(
+            train_data["user"].to_numpy()
+        )
+        cls.item_unique_vals = cls._sorted_unique(
+            train_data["item"].to_numpy()
+        )
+
+    @staticmethod
+    def _sorted_unique(values):
+        # `np.unique` sorts the whole column, whereas `pd.unique` deduplicates
+        # through a hash table, so only the (usually far fewer) unique values
+        # need to be sorted for the later `np.searchsorted` lookup.
+        return np.sort(pd.unique(values))
 
 
 class DatasetPure(Dataset):
@@ -294,7 +303,7 @@ class DatasetFeat(Dataset):
             else None
         )
         train_dense_values = (
-            train_data[cls.dense_col].to_numpy()
+            train_data[cls.dense_col].to_numpy(dtype=np.float32)
             if cls.dense_col
             else None
         )
@@ -412,7 +421,9 @@ class DatasetFeat(Dataset):
             else None
         )
         test_dense_values = (
-            test_data[cls.dense_col].to_numpy() if cls.dense_col else None
+            test_data[cls.dense_col].to_numpy(dtype=np.float32)
+            if cls.dense_col
+            else None
         )
 
         if "label" in test_data.columns:
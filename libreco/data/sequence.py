@@ -3,58 +3,58 @@ from random import random
 import numpy as np
 
 
+def _sparse_interacted_indices(interacted_len, interacted_items):
+    # row index of every interacted item, the second column is all zeros
+    indices = np.zeros((int(np.sum(interacted_len)), 2), dtype=np.int64)
+    indices[:, 0] = np.repeat(np.arange(len(interacted_len)), interacted_len)
+    interacted_items = (
+        np.concatenate(interacted_items).astype(np.int32, copy=False)
+        if interacted_items
+        else np.array([], dtype=np.int32)
+    )
+    assert len(indices) == len(interacted_items), (
+        "length of indices and values doesn't match")
+    return indices, interacted_items
+
+
 def sparse_user_interacted(user_indices, item_indices, user_consumed,
                            mode=None, num=None):
+    # Collect the interacted items of every row and convert them to arrays
+    # once at the end, instead of building flat python lists item by item.
+    interacted_len = np.zeros(len(user_indices), dtype=np.int64)
+    interacted_items = []
     for j, (u, i) in enumerate(zip(user_indices, item_indices)):
         consumed_items = user_consumed[u]
-        interacted_indices = []
-        interacted_items = []
         position = consumed_items.index(i)
         if position == 0:  # first item, no history interaction
             continue
         elif position < num:
-            interacted_indices.extend([j] * position)
-            interacted_items.extend(consumed_items[:position])
+            items = consumed_items[:position]
         elif position >= num and mode == "recent":
             start_index = position - num
-            interacted_indices.extend([j] * num)
-            interacted_items.extend(consumed_items[start_index: position])
+            items = consumed_items[start_index: position]
         elif position >= num and mode == "random":
-            interacted_indices.extend([j] * num)
-            chosen_items = np.random.choice(
-                consumed_items, num, replace=False).tolist()
-            interacted_items.extend(chosen_items)
+            items = np.random.choice(consumed_items, num, replace=False)
+        else:
+            continue
+        interacted_len[j] = len(items)
+        interacted_items.append(items)
 
-    assert len(interacted_indices) == len(interacted_items), (
-        "length of indices and values doesn't match")
-    interacted_indices = np.asarray(interacted_indices).reshape(-1, 1)
-    indices = np.concatenate(
-        [interacted_indices, np.zeros_like(interacted_indices)],
-        axis=1)
+    indices, interacted_items = _sparse_interacted_indices(
+        interacted_len, interacted_items)
     return indices, interacted_items, len(user_indices)
 
 
 def sparse_user_last_interacted(user_indices, user_consumed, recent_num=10):
     assert isinstance(recent_num, int), "recent_num must be integer"
-    for u in user_indices:
-        u_consumed_items = user_consumed[u]
-        u_items_len = len(u_consumed_items)
-        interacted_indices = []
-        interacted_items = []
-        if u_items_len < recent_num:
-            interacted_indices.extend([u] * u_items_len)
-            interacted_items.extend(u_consumed_items)
-        else:
-            interacted_indices.extend([u] * recent_num)
-            interacted_items.extend(u_consumed_items[-recent_num:])
+    interacted_len = np.zeros(len(user_indices), dtype=np.int64)
+    interacted_items = []
+    for j, u in enumerate(user_indices):
+        u_consumed_items = user_consumed[u][-recent_num:]
+        interacted_len[j] = len(u_consumed_items)
+        interacted_items.append(u_consumed_items)
 
-    assert len(interacted_indices) == len(interacted_items), (
-        "length of indices and values doesn't match")
-    interacted_indices = np.asarray(interacted_indices).reshape(-1, 1)
-    indices = np.concatenate(
-        [interacted_indices, np.zeros_like(interacted_indices)],
-        axis=1)
-    return indices, interacted_items
+    return _sparse_interacted_indices(interacted_len, interacted_items)
 
 
 def sample_item_with_tolerance(num, consumed_items, consumed_len, tolerance=5):
@@ -75,7 +75,7 @@ def user_interacted_seq(user_indices, item_indices, user_consumed, pad_index,
                         mode=None, num=None, user_consumed_set=None):
     batch_size = len(user_indices)
     batch_interacted = np.full((batch_size, num), pad_index, dtype=np.int32)
-    batch_interacted_len = []
+    batch_interacted_len = np.zeros(batch_size, dtype=np.float32)
     for j, (u, i) in enumerate(zip(user_indices, item_indices)):
         consumed_items = user_consumed[u]
         consumed_len = len(consumed_items)
@@ -90,28 +90,28 @@ def user_interacted_seq(user_indices, item_indices, user_consumed, pad_index,
                 chosen_items = sample_item_with_tolerance(
                     num, consumed_items, consumed_len, 5)
                 batch_interacted[j] = chosen_items
-                batch_interacted_len.append(float(num))
+                batch_interacted_len[j] = num
             else:
                 batch_interacted[j, :consumed_len] = consumed_items
-                batch_interacted_len.append(float(consumed_len))
+                batch_interacted_len[j] = consumed_len
         else:
             position = consumed_items.index(i)
             if position == 0:
                 # first item, no historical interaction,
                 # assign to pad_index by default, and length is 1.
-                batch_interacted_len.append(1.0)
+                batch_interacted_len[j] = 1.0
             elif position < num:
                 batch_interacted[j, :position] = consumed_items[:position]
-                batch_interacted_len.append(float(position))
+                batch_interacted_len[j] = position
             elif position >= num and mode == "recent":
                 start_index = position - num
                 batch_interacted[j] = consumed_items[start_index: position]
-                batch_interacted_len.append(float(num))
+                batch_interacted_len[j] = num
             elif position >= num and mode == "random":
                 chosen_items = np.random.choice(consumed_items, num,
                                                 replace=False)
                 batch_interacted[j] = chosen_items
-                batch_interacted_len.append(float(num))
+                batch_interacted_len[j] = num
 
     return batch_interacted, batch_interacted_len
 
@@ -120,17 +120,17 @@ def user_interacted_seq(user_indices, item_indices, user_consumed, pad_index,
 def user_last_interacted(user_indices, user_consumed, pad_index, recent_num=10):
     size = len(user_indices)
     u_last_interacted = np.full((size, recent_num), pad_index, dtype=np.int32)
-    interacted_len = []
+    interacted_len = np.zeros(size, dtype=np.float32)
     for u in user_indices:
         u_consumed_items = user_consumed[u]
         u_items_len = len(u_consumed_items)
         if u_items_len < recent_num:
             u_last_interacted[u, :u_items_len] = u_consumed_items
-            interacted_len.append(float(u_items_len))
+            interacted_len[u] = u_items_len
         else:
             u_last_interacted[u] = u_consumed_items[-recent_num:]
-            interacted_len.append(float(recent_num))
+            interacted_len[u] = recent_num
 
-    return u_last_interacted, np.asarray(interacted_len)
+    return u_last_interacted, interacted_len
 
 
@@ -37,7 +37,8 @@ class TransformedSet(object):
         self.dense_values_orig = None
 
     def build_negative_samples(self, data_info, num_neg=1,
-                               item_gen_mode="random", seed=42):
+                               item_gen_mode="random", seed=42,
+                               num_threads=1):
         self.has_sampled = True
         self.user_indices_orig = self._user_indices
         self.item_indices_orig = self._item_indices
@@ -45,10 +46,12 @@ class TransformedSet(object):
         self.sparse_indices_orig = self._sparse_indices
         self.dense_values_orig = self._dense_values
 
-        self._build_negative_samples(data_info, num_neg, item_gen_mode, seed)
+        self._build_negative_samples(data_info, num_neg, item_gen_mode, seed,
+                                     num_threads)
 
     def _build_negative_samples(self, data_info, num_neg=1,
-                                item_gen_mode="random", seed=42):
+                                item_gen_mode="random", seed=42,
+                                num_threads=1):
         sparse_part = False if self.sparse_indices is None else True
         dense_part = False if self.dense_values is None else True
         neg = NegativeSampling(self, data_info, num_neg,
@@ -60,7 +63,8 @@ class TransformedSet(object):
             self._labels,
             self._sparse_indices,
             self._dense_values
-        ) = neg.generate_all(seed=seed, item_gen_mode=item_gen_mode)
+        ) = neg.generate_all(seed=seed, item_gen_mode=item_gen_mode,
+                             num_threads=num_threads)
 
     def __len__(self):
         return len(self.labels)
@@ -77,10 +81,6 @@ class TransformedSet(object):
     def sparse_indices(self):
         return self._sparse_indices
 
-#    @property
-#    def dense_indices(self):
-#        return self._dense_indices
-
     @property
     def dense_values(self):
         return self._dense_values
@@ -1,5 +1,6 @@
 import itertools
 import numpy as np
+import pandas as pd
 
 
 def get_user_item_sparse_indices(data_class, data, mode="train"):
@@ -18,76 +19,74 @@ def merge_sparse_col(sparse_col, multi_sparse_col):
 
 
 def merge_sparse_indices(data_class, data, sparse_col, multi_sparse_col, mode):
-    if sparse_col and multi_sparse_col:
-        sparse_indices = get_sparse_indices_matrix(
-            data_class, data, sparse_col, mode
-        )
-        sparse_offset = get_sparse_offset(data_class, sparse_col)
-        sparse_indices = sparse_indices + sparse_offset[:-1]
-
-        multi_sparse_indices = get_multi_sparse_indices_matrix(
-            data_class, data, multi_sparse_col, mode
+    n_samples = len(data)
+    n_sparse = len(sparse_col) if sparse_col else 0
+    n_multi_sparse = (
+        len(list(itertools.chain.from_iterable(multi_sparse_col)))
+        if multi_sparse_col
+        else 0
+    )
+    # allocate the final matrix once and write every column with its offset
+    # in place, instead of building separate matrices and concatenating them
+    sparse_indices = np.empty((n_samples, n_sparse + n_multi_sparse),
+                              dtype=np.int32)
+
+    sparse_offset = (
+        get_sparse_offset(data_class, sparse_col)
+        if sparse_col
+        else np.zeros(1, dtype=np.int64)
+    )
+    if sparse_col:
+        get_sparse_indices_matrix(
+            data_class, data, sparse_col, mode,
+            offset=sparse_offset[:-1],
+            out=sparse_indices[:, :n_sparse]
         )
+    if multi_sparse_col:
         multi_sparse_offset = get_multi_sparse_offset(
             data_class, multi_sparse_col
         )
-        multi_sparse_indices = (
-            multi_sparse_indices + sparse_offset[-1] + multi_sparse_offset
-        )
-        return np.concatenate([sparse_indices, multi_sparse_indices], axis=1)
-
-    elif sparse_col:
-        sparse_indices = get_sparse_indices_matrix(
-            data_class, data, sparse_col, mode)
-        sparse_offset = get_sparse_offset(data_class, sparse_col
-                                          )
-        return sparse_indices + sparse_offset[:-1]
-
-    elif multi_sparse_col:
-        multi_sparse_indices = get_multi_sparse_indices_matrix(
-            data_class, data, multi_sparse_col, mode
-        )
-        multi_sparse_offset = get_multi_sparse_offset(
-            data_class, multi_sparse_col
+        get_multi_sparse_indices_matrix(
+            data_class, data, multi_sparse_col, mode,
+            offset=multi_sparse_offset + sparse_offset[-1],
+            out=sparse_indices[:, n_sparse:]
         )
-        return multi_sparse_indices + multi_sparse_offset
+    return sparse_indices
 
 
-def get_sparse_indices_matrix(data_class, data, sparse_col, mode="train"):
+def get_sparse_indices_matrix(data_class, data, sparse_col, mode="train",
+                              offset=None, out=None):
     n_samples, n_features = len(data), len(sparse_col)
-    sparse_indices = np.zeros((n_samples, n_features), dtype=np.int32)
+    if out is None:
+        out = np.empty((n_samples, n_features), dtype=np.int32)
     for i, col in enumerate(sparse_col):
         col_values = data[col].to_numpy()
         unique_values = data_class.sparse_unique_vals[col]
-        sparse_indices[:, i] = column_sparse_indices(
-            col_values, unique_values, mode
-        )
-    return sparse_indices
+        col_indices = column_sparse_indices(col_values, unique_values, mode)
+        col_offset = offset[i] if offset is not None else 0
+        np.add(col_indices, col_offset, out=out[:, i], casting="unsafe")
+    return out
 
 
 def get_multi_sparse_indices_matrix(data_class, data, multi_sparse_col,
-                                    mode="train"):
+                                    mode="train", offset=None, out=None):
     n_samples = len(data)
     # n_fields = len(multi_sparse_col)
     n_features = len(list(itertools.chain.from_iterable(multi_sparse_col)))
-    multi_sparse_indices = np.zeros((n_samples, n_features), dtype=np.int32)
+    if out is None:
+        out = np.empty((n_samples, n_features), dtype=np.int32)
     i = 0
-    while i < n_features:
-        for field in multi_sparse_col:
-            unique_values = data_class.multi_sparse_unique_vals[field[0]]
-            for col in field:
-                col_values = data[col].to_numpy()
-                multi_sparse_indices[:, i] = column_sparse_indices(
-                    col_values, unique_values, mode
-                )
-                i += 1
-    return multi_sparse_indices
-
-
-def get_dense_indices_matrix(data, dense_col):
-    n_samples, n_features = len(data), len(dense_col)
-    dense_indices = np.tile(np.arange(n_features), [n_samples, 1])
-    return dense_indices
+    for field in multi_sparse_col:
+        unique_values = data_class.multi_sparse_unique_vals[field[0]]
+        for col in field:
+            col_values = data[col].to_numpy()
+            col_indices = column_sparse_indices(
+                col_values, unique_values, mode
+            )
+            col_offset = offset[i] if offset is not None else 0
+            np.add(col_indices, col_offset, out=out[:, i], casting="unsafe")
+            i += 1
+    return out
 
 
 def get_sparse_offset(data_class, sparse_col):
@@ -111,17 +110,12 @@ def get_multi_sparse_offset(data_class, multi_sparse_col):
     return np.array(offset)
 
 
-def check_unknown(values, uniques):
-    # diff = list(np.setdiff1d(values, uniques, assume_unique=True))
-    mask = np.in1d(values, uniques, invert=True)
-    return mask
-
-
 def column_sparse_indices(values, unique, mode="train"):
     if mode == "test":
-        not_in_mask = check_unknown(values, unique)
-        col_indices = np.searchsorted(unique, values)
-        col_indices[not_in_mask] = len(unique)
+        # hash lookup against the train unique values, unknown values get -1,
+        # which avoids the extra sort of `np.in1d` + `np.searchsorted`
+        col_indices = pd.Index(unique).get_indexer(values)
+        col_indices[col_indices == -1] = len(unique)
     elif mode == "train":
         col_indices = np.searchsorted(unique, values)
     else:
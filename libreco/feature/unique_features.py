@@ -38,11 +38,12 @@ def construct_unique_feat(user_indices, item_indices, sparse_indices,
 def _compress_unique_values(orig_val, col, unique_indices):
     values = np.take(orig_val, col, axis=1)
     values = values.reshape(-1, 1) if orig_val.ndim == 1 else values
-    unique_indices = unique_indices.reshape(-1, 1)
-    indices_plus_values = np.concatenate([unique_indices, values], axis=-1)
-    # np.unique(axis=0) will sort the data based on first column,
-    # so we can do direct mapping, then remove redundant unique_indices
-    return np.unique(indices_plus_values, axis=0)[:, 1:]
+    # features are unique for every user or item, so scatter the rows
+    # by index directly instead of sorting them with np.unique(axis=0)
+    n_unique = np.max(unique_indices) + 1
+    unique_values = np.empty((n_unique, values.shape[1]), dtype=values.dtype)
+    unique_values[unique_indices] = values
+    return unique_values
 
 
 def get_predict_indices_and_values(data_info, user, item, n_items,
@@ -78,21 +79,29 @@ def get_recommend_indices_and_values(data_info, user, n_items, sparse, dense):
     return user_indices, item_indices, sparse_indices, dense_values
 
 
+def _merge_user_item_columns(user_part, item_part, col_pos, size):
+    # Write user and item columns directly into their original positions,
+    # instead of concatenating both parts and reordering with fancy indexing.
+    user_pos, item_pos = col_pos
+    merged = np.empty((size, len(user_pos) + len(item_pos)),
+                      dtype=np.result_type(user_part, item_part))
+    merged[:, user_pos] = user_part
+    merged[:, item_pos] = item_part
+    return merged
+
+
 def get_sparse_indices(data_info, user, item=None, n_items=None,
                        mode="predict"):
     user_sparse_col = data_info.user_sparse_col.index
     item_sparse_col = data_info.item_sparse_col.index
-    orig_cols = user_sparse_col + item_sparse_col
-    # keep column names in original order
-    col_reindex = np.arange(len(orig_cols))[np.argsort(orig_cols)]
 
     if mode == "predict":
         if user_sparse_col and item_sparse_col:
-            user_sparse_part = data_info.user_sparse_unique[user]
-            item_sparse_part = data_info.item_sparse_unique[item]
-            sparse_indices = np.concatenate(
-                [user_sparse_part, item_sparse_part], axis=-1)[:, col_reindex]
-            return sparse_indices
+            return _merge_user_item_columns(
+                data_info.user_sparse_unique[user],
+                data_info.item_sparse_unique[item],
+                data_info.sparse_col_pos, len(item)
+            )
         elif user_sparse_col:
             return data_info.user_sparse_unique[user]
         elif item_sparse_col:
@@ -100,42 +109,29 @@ def get_sparse_indices(data_info, user, item=None, n_items=None,
 
     elif mode == "recommend":
         if user_sparse_col and item_sparse_col:
-            user_sparse_part = np.tile(data_info.user_sparse_unique[user],
-                                       (n_items, 1))
-            item_sparse_part = data_info.item_sparse_unique
-            sparse_indices = np.concatenate(
-                [user_sparse_part, item_sparse_part], axis=-1)[:, col_reindex]
-            return sparse_indices
+            # the single user row is broadcast to all items
+            return _merge_user_item_columns(
+                data_info.user_sparse_unique[user],
+                data_info.item_sparse_unique,
+                data_info.sparse_col_pos, n_items
+            )
         elif user_sparse_col:
             return np.tile(data_info.user_sparse_unique[user], (n_items, 1))
         elif item_sparse_col:
             return data_info.item_sparse_unique
 
 
-def get_dense_indices(data_info, user, n_items=None, mode="predict"):
-    user_dense_col = data_info.user_dense_col.index
-    item_dense_col = data_info.item_dense_col.index
-    total_dense_cols = len(user_dense_col) + len(item_dense_col)
-    if mode == "predict":
-        return np.tile(np.arange(total_dense_cols), (len(user), 1))
-    elif mode == "recommend":
-        return np.tile(np.arange(total_dense_cols), (n_items, 1))
-
-
 def get_dense_values(data_info, user, item=None, n_items=None, mode="predict"):
     user_dense_col = data_info.user_dense_col.index
     item_dense_col = data_info.item_dense_col.index
-    # keep column names in original order
-    orig_cols = user_dense_col + item_dense_col
-    col_reindex = np.arange(len(orig_cols))[np.argsort(orig_cols)]
 
     if mode == "predict":
         if user_dense_col and item_dense_col:
-            user_dense_part = data_info.user_dense_unique[user]
-            item_dense_part = data_info.item_dense_unique[item]
-            dense_values = np.concatenate(
-                [user_dense_part, item_dense_part], axis=-1)[:, col_reindex]
-            return dense_values
+            return _merge_user_item_columns(
+                data_info.user_dense_unique[user],
+                data_info.item_dense_unique[item],
+                data_info.dense_col_pos, len(item)
+            )
         elif user_dense_col:
             return data_info.user_dense_unique[user]
         elif item_dense_col:
@@ -143,14 +139,12 @@ def get_dense_values(data_info, user, item=None, n_items=None, mode="predict"):
 
     elif mode == "recommend":
         if user_dense_col and item_dense_col:
-            user_dense_part = np.tile(data_info.user_dense_unique[user],
-                                      (n_items, 1))
-            item_dense_part = data_info.item_dense_unique
-            dense_values = np.concatenate(
-                [user_dense_part, item_dense_part], axis=-1)[:, col_reindex]
-            return dense_values
+            return _merge_user_item_columns(
+                data_info.user_dense_unique[user],
+                data_info.item_dense_unique,
+                data_info.dense_col_pos, n_items
+            )
         elif user_dense_col:
             return np.tile(data_info.user_dense_unique[user], (n_items, 1))
         elif item_dense_col:
             return data_info.item_dense_unique
-
@@ -0,0 +1,106 @@
+"""
+
+Numba version of negative item sampling, used by samplers in `sampling.py`
+when numba is available.
+
+"""
+import numpy as np
+from numba import njit, prange
+
+
+@njit(nogil=True, cache=True)
+def _check_consumed(consumed_items, start, end, item):
+    # binary search, consumed items of every user are sorted
+    lo, hi = start, end
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if consumed_items[mid] < item:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo < end and consumed_items[lo] == item
+
+
+@njit(nogil=True, cache=True)
+def _splitmix64(state):
+    state += np.uint64(0x9E3779B97F4A7C15)
+    z = state
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return state, z ^ (z >> np.uint64(31))
+
+
+@njit(nogil=True, cache=True)
+def _random_item(state, n_items):
+    state, z = _splitmix64(state)
+    return state, np.int32(z % np.uint64(n_items))
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def sample_items_neg(user_indices, num_neg, n_items,
+                     consumed_indptr, consumed_items, seed):
+    """Sample `num_neg` items for every user which the user hasn't consumed.
+
+    Parameters
+    ----------
+    user_indices : numpy.ndarray
+        Users to sample for.
+    num_neg : int
+        Number of negative items per user.
+    n_items : int
+        Total number of items.
+    consumed_indptr : numpy.ndarray
+        CSR-style row pointer, items consumed by user `u` are
+        `consumed_items[consumed_indptr[u]: consumed_indptr[u + 1]]`.
+    consumed_items : numpy.ndarray
+        Concatenated consumed items of all users, sorted within each user.
+    seed : int
+        Random seed. Every row derives its own random stream from it,
+        so the result doesn't depend on the number of threads.
+
+    Returns
+    -------
+    items_neg : numpy.ndarray
+        Sampled items with shape (len(user_indices), num_neg).
+    """
+    size = len(user_indices)
+    items_neg = np.empty((size, num_neg), dtype=np.int32)
+    for i in prange(size):
+        _, state = _splitmix64(np.uint64(seed) ^ np.uint64(i))
+        user = user_indices[i]
+        start, end = consumed_indptr[user], consumed_indptr[user + 1]
+        for k in range(num_neg):
+            state, item_neg = _random_item(state, n_items)
+            while _check_consumed(consumed_items, start, end, item_neg):
+                state, item_neg = _random_item(state, n_items)
+            items_neg[i, k] = item_neg
+    return items_neg
+
+
+@njit(nogil=True, cache=True)
+def _alias_item(state, prob, alias):
+    state, z = _splitmix64(state)
+    k = z % np.uint64(len(prob))
+    # the upper 53 bits as a uniform float in [0, 1)
+    state, z = _splitmix64(state)
+    u = np.float64(z >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+    return state, np.int32(k) if u < prob[k] else alias[k]
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def sample_items_neg_popular(user_indices, num_neg, consumed_indptr,
+                             consumed_items, prob, alias, seed):
+    """Same as `sample_items_neg`, but items are drawn proportional to
+    popularity from the `(prob, alias)` table built by `alias_table`."""
+    size = len(user_indices)
+    items_neg = np.empty((size, num_neg), dtype=np.int32)
+    for i in prange(size):
+        _, state = _splitmix64(np.uint64(seed) ^ np.uint64(i))
+        user = user_indices[i]
+        start, end = consumed_indptr[user], consumed_indptr[user + 1]
+        for k in range(num_neg):
+            state, item_neg = _alias_item(state, prob, alias)
+            while _check_consumed(consumed_items, start, end, item_neg):
+                state, item_neg = _alias_item(state, prob, alias)
+            items_neg[i, k] = item_neg
+    return items_neg
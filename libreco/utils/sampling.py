@@ -1,98 +1,300 @@
-from math import floor
-from random import random, seed as set_random_seed
+import logging
+import time
+from contextlib import contextmanager
+from multiprocessing import Pool
 import numpy as np
 from tqdm import tqdm
 from ..data.sequence import user_interacted_seq
-from ..utils.misc import time_block
+try:
+    from ._sampling_numba import sample_items_neg, sample_items_neg_popular
+except (ImportError, ModuleNotFoundError):
+    sample_items_neg = sample_items_neg_popular = None
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _debug_time_block(block_name):
+    # only measure time when debug logging is enabled
+    if not logger.isEnabledFor(logging.DEBUG):
+        yield
+        return
+    start = time.perf_counter()
+    yield
+    logger.debug("%s elapsed: %.3fs", block_name, time.perf_counter() - start)
+
+
+def user_consumed_csr(user_consumed, n_users):
+    """Convert dict of user consumed items to CSR-style flat arrays.
+
+    Items of every user are sorted, so membership can be tested
+    with binary search.
+    """
+    consumed_indptr = np.zeros(n_users + 1, dtype=np.int64)
+    for u, items in user_consumed.items():
+        consumed_indptr[u + 1] = len(items)
+    np.cumsum(consumed_indptr, out=consumed_indptr)
+    consumed_items = np.empty(consumed_indptr[-1], dtype=np.int32)
+    for u, items in user_consumed.items():
+        u_items = consumed_items[consumed_indptr[u]: consumed_indptr[u + 1]]
+        u_items[:] = items
+        u_items.sort()
+    return consumed_indptr, consumed_items
+
+
+def user_item_keys(consumed_indptr, consumed_items, n_items):
+    """Globally sorted `user * n_items + item` keys of all consumed items."""
+    users = np.repeat(np.arange(len(consumed_indptr) - 1, dtype=np.int64),
+                      np.diff(consumed_indptr))
+    return users * n_items + consumed_items
+
+
+def user_candidate_counts(consumed_indptr, consumed_items, n_items):
+    """Number of items every user hasn't consumed, i.e. can be sampled."""
+    n_users = len(consumed_indptr) - 1
+    users = np.repeat(np.arange(n_users), np.diff(consumed_indptr))
+    # items are sorted within each user, so repeated items are adjacent
+    distinct = np.ones(len(consumed_items), dtype=bool)
+    distinct[1:] = ((consumed_items[1:] != consumed_items[:-1])
+                    | (users[1:] != users[:-1]))
+    return n_items - np.bincount(users[distinct], minlength=n_users)
+
+
+def alias_table(weights):
+    """Build Walker's alias table for sampling proportional to `weights`.
+
+    Drawing from the table only needs two array lookups: pick a column
+    `k` uniformly, then keep `k` with probability `prob[k]`, otherwise
+    take `alias[k]`.
+
+    Returns
+    -------
+    prob : numpy.ndarray
+        Probability of keeping each column.
+    alias : numpy.ndarray
+        Alternative item of each column.
+    """
+    n = len(weights)
+    prob = np.asarray(weights, dtype=np.float64) * n / np.sum(weights)
+    alias = np.arange(n, dtype=np.int32)
+    small = np.flatnonzero(prob < 1.0).tolist()
+    large = np.flatnonzero(prob >= 1.0).tolist()
+    while small and large:
+        less, more = small.pop(), large.pop()
+        alias[less] = more
+        prob[more] -= 1.0 - prob[less]
+        if prob[more] < 1.0:
+            small.append(more)
+        else:
+            large.append(more)
+    # remaining columns are full up to floating point error
+    prob[small + large] = 1.0
+    return prob, alias
+
+
+def _draw_items(rng, size, n_items, alias=None):
+    if alias is None:
+        return rng.integers(0, n_items, size=size, dtype=np.int32)
+    prob, alias = alias
+    k = rng.integers(0, len(prob), size=size, dtype=np.int32)
+    return np.where(rng.random(size) < prob[k], k, alias[k])
+
+
+def sample_items_neg_bulk(user_indices, num_neg, n_items, consumed_keys,
+                          rng, alias=None):
+    """Sample `num_neg` items for every user which the user hasn't consumed.
+
+    All candidates are drawn with one vectorized call, then only the
+    rejected positions are resampled, which are usually a small fraction.
+    Membership is tested by binary search over `consumed_keys`.
+    Items are drawn uniformly, or from the `(prob, alias)` table built
+    by `alias_table` if provided.
+
+    Returns
+    -------
+    items_neg : numpy.ndarray
+        Sampled items with shape (len(user_indices), num_neg).
+    """
+    user_keys = np.multiply(user_indices, n_items, dtype=np.int64)
+    # a single negative item per user needs no repeat
+    if num_neg > 1:
+        user_keys = np.repeat(user_keys, num_neg)
+    items_neg = _draw_items(rng, len(user_keys), n_items, alias)
+    rejected = np.arange(len(user_keys))
+    while len(rejected) > 0:
+        keys = user_keys[rejected] + items_neg[rejected]
+        pos = np.searchsorted(consumed_keys, keys)
+        pos[pos == len(consumed_keys)] = 0
+        rejected = rejected[consumed_keys[pos] == keys]
+        items_neg[rejected] = _draw_items(rng, len(rejected), n_items, alias)
+    return items_neg.reshape(-1, num_neg)
+
+
+def _sample_items_neg_chunk(user_indices, num_neg, n_items, consumed_keys,
+                            seed_seq, alias=None):
+    rng = np.random.default_rng(seed_seq)
+    return sample_items_neg_bulk(
+        user_indices, num_neg, n_items, consumed_keys, rng, alias)
+
+
+def interleave_items(item_indices, items_neg):
+    """Place each positive item before its own negative items."""
+    factor = items_neg.shape[1] + 1
+    item_indices_sampled = np.empty((len(item_indices), factor),
+                                    dtype=np.int32)
+    item_indices_sampled[:, 0] = item_indices
+    item_indices_sampled[:, 1:] = items_neg
+    return item_indices_sampled.ravel()
+
+
+def interleave_labels(size, num_neg):
+    """Labels matching `interleave_items`, 1.0 for positive items."""
+    labels = np.zeros((size, num_neg + 1), dtype=np.float32)
+    labels[:, 0] = 1.0
+    return labels.ravel()
 
 
 class SamplingBase(object):
-    def __init__(self, dataset, data_info, num_neg=1):
+    def __init__(self, dataset, data_info, num_neg=1, seed=42):
         self.dataset = dataset
         self.data_info = data_info
         self.num_neg = num_neg
+        self._rng = np.random.default_rng(seed)
+        # sampled item indices are int32
+        assert data_info.n_items < 2 ** 31, "too many items for int32"
+        self.consumed_indptr = None
+        self.consumed_items = None
+        self.consumed_keys = None
+
+    def _build_consumed_csr(self):
+        # Built once on the first sampling call and reused in every epoch.
+        # Unknown users in eval data are indexed as `n_users`, so one
+        # more empty row is kept for them.
+        (
+            self.consumed_indptr,
+            self.consumed_items
+        ) = user_consumed_csr(self.data_info.user_consumed,
+                              self.data_info.n_users + 1)
+        if sample_items_neg is None:
+            self.consumed_keys = user_item_keys(
+                self.consumed_indptr, self.consumed_items,
+                self.data_info.n_items)
+        self.users_exhausted = user_candidate_counts(
+            self.consumed_indptr, self.consumed_items,
+            self.data_info.n_items) == 0
+
+    def _check_candidates(self, user_indices):
+        if self.consumed_indptr is None:
+            self._build_consumed_csr()
+        # The rejection loops would never end for a user who has consumed
+        # all items. Popularity weights come from the train data, so they
+        # are positive for every item and the same check applies.
+        exhausted = self.users_exhausted[user_indices]
+        if np.any(exhausted):
+            user = user_indices[np.argmax(exhausted)]
+            raise ValueError(
+                f"user {user} has consumed all items, "
+                f"no negative item can be sampled"
+            )
 
-    def sample_items_random(self, seed=42):
-        set_random_seed(seed)
+    def _sample_items_neg(self, user_indices, num_neg, n_items, rng,
+                          alias=None):
+        self._check_candidates(user_indices)
+        if sample_items_neg is not None:
+            seed = rng.integers(np.iinfo(np.int64).max)
+            if alias is not None:
+                return sample_items_neg_popular(
+                    user_indices, num_neg,
+                    self.consumed_indptr, self.consumed_items,
+                    alias[0], alias[1], seed
+                )
+            return sample_items_neg(
+                user_indices, num_neg, n_items,
+                self.consumed_indptr, self.consumed_items, seed
+            )
+        return sample_items_neg_bulk(
+            user_indices, num_neg, n_items, self.consumed_keys, rng, alias)
+
+    def _sample_items_neg_parallel(self, user_indices, num_neg, n_items,
+                                   seed, num_threads, alias=None):
+        self._check_candidates(user_indices)
+        # independent random stream for every process
+        seed_seqs = np.random.SeedSequence(seed).spawn(num_threads)
+        chunks = np.array_split(user_indices, num_threads)
+        with Pool(num_threads) as pool:
+            items_neg = pool.starmap(
+                _sample_items_neg_chunk,
+                [(chunk, num_neg, n_items, self.consumed_keys, seed_seq,
+                  alias) for chunk, seed_seq in zip(chunks, seed_seqs)]
+            )
+        return np.concatenate(items_neg, axis=0)
+
+    def _sample_items(self, seed, num_threads, alias=None):
         n_items = self.data_info.n_items
-        item_indices_sampled = list()
-        # set is much faster for search contains
-        user_consumed = {
-            u: set(items) for u, items in self.data_info.user_consumed.items()
-        }
+        # numba version is already multi-threaded
+        if sample_items_neg is None and num_threads > 1:
+            items_neg = self._sample_items_neg_parallel(
+                self.dataset.user_indices, self.num_neg, n_items,
+                seed, num_threads, alias
+            )
+        else:
+            rng = np.random.default_rng(seed)
+            items_neg = self._sample_items_neg(
+                self.dataset.user_indices, self.num_neg, n_items, rng, alias)
+        return interleave_items(self.dataset.item_indices, items_neg)
+
+    def sample_items_random(self, seed=42, num_threads=1):
         # sample negative items for every user
-        with time_block("random neg item sampling"):
-            for u, i in zip(self.dataset.user_indices,
-                            self.dataset.item_indices):
-                item_indices_sampled.append(i)
-                for _ in range(self.num_neg):
-                    item_neg = floor(n_items * random())
-                    while item_neg in user_consumed[u]:
-                        item_neg = floor(n_items * random())
-                    item_indices_sampled.append(item_neg)
-        return np.asarray(item_indices_sampled)
-
-    def sample_items_popular(self, seed=42):
-        data = self.data_info.get_indexed_interaction()
-        item_counts = data.item.value_counts().sort_index().to_numpy()
-        user_consumed = self.data_info.user_consumed
-        items = np.arange(self.data_info.n_items)
-
-        item_order = list()
-        item_indices_sampled = list()
-        with time_block("popularity-based neg item sampling"):
-            for user, u_data in data.groupby("user", sort=False):
-                item_indices = u_data.index.to_list()
-                item_indices = item_indices * (self.num_neg + 1)
-                item_order.extend(item_indices)
-
-                # add positive items
-                item_indices_sampled.extend(u_data.item.tolist())
-                u_consumed = user_consumed[user]
-                u_item_counts = item_counts.copy()
-                u_item_counts[u_consumed] = 0
-                item_prob = u_item_counts / np.sum(u_item_counts)
-                neg_size = len(u_consumed) * self.num_neg
-
-                neg_sampled = np.random.choice(
-                    items, size=neg_size, p=item_prob, replace=True)
-                item_indices_sampled.extend(neg_sampled)
-
-        item_indices_sampled = np.asarray(item_indices_sampled)
-        # must be stable sort to keep relative order
-        item_order = np.argsort(item_order, kind="mergesort")
-        return item_indices_sampled[item_order]
-
-    def _label_negative_sampling(self, size):
-        factor = self.num_neg + 1
-        total_length = size * factor
-        labels = np.zeros(total_length, dtype=np.float32)
-        labels[::factor] = 1.0
-        return labels
+        with _debug_time_block("random neg item sampling"):
+            item_indices_sampled = self._sample_items(seed, num_threads)
+        return item_indices_sampled
+
+    def sample_items_popular(self, seed=42, num_threads=1):
+        # Draw items proportional to popularity from an alias table, then
+        # reject consumed ones. This is the same as renormalizing the
+        # popularity of non-consumed items for every user.
+        with _debug_time_block("popularity-based neg item sampling"):
+            # popularity always comes from the train data, also when
+            # sampling eval data, so every train item can be sampled
+            alias = alias_table(self.data_info.item_popularity)
+            item_indices_sampled = self._sample_items(
+                seed, num_threads, alias)
+        return item_indices_sampled
 
 
 class NegativeSampling(SamplingBase):
     def __init__(self, dataset, data_info, num_neg, sparse=None, dense=None,
-                 batch_sampling=False):
-        super(NegativeSampling, self).__init__(dataset, data_info, num_neg)
+                 batch_sampling=False, seed=42):
+        super(NegativeSampling, self).__init__(dataset, data_info, num_neg,
+                                               seed)
 
         if batch_sampling and dataset.has_sampled:
             self.user_indices = dataset.user_indices_orig
             self.item_indices = dataset.item_indices_orig
-            self.sparse_indices = (
-                dataset.sparse_indices_orig if sparse else None)
-            self.dense_values = (
-                dataset.dense_values_orig if dense else None)
+            sparse_indices = dataset.sparse_indices_orig if sparse else None
+            dense_values = dataset.dense_values_orig if dense else None
         else:
             self.user_indices = dataset.user_indices
             self.item_indices = dataset.item_indices
-            self.sparse_indices = dataset.sparse_indices if sparse else None
-            self.dense_values = dataset.dense_values if dense else None
+            sparse_indices = dataset.sparse_indices if sparse else None
+            dense_values = dataset.dense_values if dense else None
+        # keep all sampled index arrays in int32
+        self.user_indices = self.user_indices.astype(np.int32, copy=False)
+        self.item_indices = self.item_indices.astype(np.int32, copy=False)
+        # Only user columns are taken from the original samples, item
+        # columns come from the unique item features. Extract them once
+        # instead of in every sampling pass.
+        self.user_sparse_indices = self._user_features(
+            sparse_indices, data_info.user_sparse_col.index
+        ) if sparse else None
+        self.user_dense_values = self._user_features(
+            dense_values, data_info.user_dense_col.index
+        ) if dense else None
         self.data_size = len(self.user_indices)
         self.sparse = sparse
         self.dense = dense
 
-    def generate_all(self, seed=42, item_gen_mode="random"):
+    def generate_all(self, seed=42, item_gen_mode="random", num_threads=1):
         user_indices_sampled = np.repeat(
             self.user_indices, self.num_neg + 1, axis=0
         )
@@ -102,17 +304,19 @@ class NegativeSampling(SamplingBase):
                 "sampling item_gen_mode must either be 'random' or 'popular'"
             )
         elif item_gen_mode == "random":
-            item_indices_sampled = self.sample_items_random(seed=seed)
+            item_indices_sampled = self.sample_items_random(
+                seed=seed, num_threads=num_threads)
         elif item_gen_mode == "popular":
-            item_indices_sampled = self.sample_items_popular(seed=seed)
+            item_indices_sampled = self.sample_items_popular(
+                seed=seed, num_threads=num_threads)
 
         sparse_indices_sampled = self._sparse_indices_sampling(
-            self.sparse_indices, item_indices_sampled
+            self.user_sparse_indices, item_indices_sampled
         ) if self.sparse else None
         dense_values_sampled = self._dense_values_sampling(
-            self.dense_values, item_indices_sampled
+            self.user_dense_values, item_indices_sampled
         ) if self.dense else None
-        label_sampled = self._label_negative_sampling(self.data_size)
+        label_sampled = interleave_labels(self.data_size, self.num_neg)
 
         return (
             user_indices_sampled,
@@ -124,52 +328,49 @@ class NegativeSampling(SamplingBase):
 
     def __call__(self, shuffle=True, batch_size=None):
         if shuffle:
-            mask = np.random.permutation(range(self.data_size))
-            self.sparse_indices = (
-                self.sparse_indices[mask] if self.sparse else None)
-            self.dense_values = (
-                self.dense_values[mask] if self.dense else None)
-
-        user_consumed = {
-            u: set(items) for u, items in self.data_info.user_consumed.items()
-        }
+            mask = self._rng.permutation(self.data_size)
+            self.user_indices = self.user_indices[mask]
+            self.item_indices = self.item_indices[mask]
+            if self.user_sparse_indices is not None:
+                self.user_sparse_indices = self.user_sparse_indices[mask]
+            if self.user_dense_values is not None:
+                self.user_dense_values = self.user_dense_values[mask]
+
         n_items = self.data_info.n_items
-        return self.sample_batch(user_consumed, n_items, batch_size)
+        return self.sample_batch(n_items, batch_size)
 
-    def sample_batch(self, user_consumed, n_items, batch_size):
+    def sample_batch(self, n_items, batch_size):
+        # labels are the same for every batch, only the last one is shorter
+        batch_labels = interleave_labels(batch_size, self.num_neg)
+        batch_labels.flags.writeable = False
         for k in tqdm(range(0, self.data_size, batch_size),
                       desc="batch_sampling train"):
             batch_slice = slice(k, k + batch_size)
             batch_user_indices = self.user_indices[batch_slice]
             batch_item_indices = self.item_indices[batch_slice]
-            batch_sparse_indices = (
-                self.sparse_indices[batch_slice] if self.sparse else None)
-            batch_dense_values = (
-                self.dense_values[batch_slice] if self.dense else None)
+            batch_user_sparse = (
+                self.user_sparse_indices[batch_slice]
+                if self.user_sparse_indices is not None else None)
+            batch_user_dense = (
+                self.user_dense_values[batch_slice]
+                if self.user_dense_values is not None else None)
 
             user_indices_sampled = np.repeat(
                 batch_user_indices, self.num_neg + 1, axis=0
             )
 
-            item_indices_sampled = list()
-            for u, i in zip(batch_user_indices, batch_item_indices):
-                item_indices_sampled.append(i)
-                for _ in range(self.num_neg):
-                    item_neg = floor(random() * n_items)
-                    while item_neg in user_consumed[u]:
-                        item_neg = floor(random() * n_items)
-                    item_indices_sampled.append(item_neg)
-            item_indices_sampled = np.array(item_indices_sampled)
+            items_neg = self._sample_items_neg(
+                batch_user_indices, self.num_neg, n_items, self._rng)
+            item_indices_sampled = interleave_items(
+                batch_item_indices, items_neg)
 
             sparse_indices_sampled = self._sparse_indices_sampling(
-                batch_sparse_indices, item_indices_sampled
+                batch_user_sparse, item_indices_sampled
             ) if self.sparse else None
             dense_values_sampled = self._dense_values_sampling(
-                batch_dense_values, item_indices_sampled
+                batch_user_dense, item_indices_sampled
             ) if self.dense else None
-            label_sampled = self._label_negative_sampling(
-                len(batch_user_indices)
-            )
+            label_sampled = batch_labels[:len(item_indices_sampled)]
 
             yield (
                 user_indices_sampled,
@@ -179,81 +380,58 @@ class NegativeSampling(SamplingBase):
                 dense_values_sampled
             )
 
-    def _sparse_indices_sampling(self, sparse_indices, item_indices_sampled):
-        user_sparse_col = self.data_info.user_sparse_col.index
-        item_sparse_col = self.data_info.item_sparse_col.index
-
-        if user_sparse_col and item_sparse_col:
-            user_sparse_indices = np.take(
-                sparse_indices, user_sparse_col, axis=1)
-            user_sparse_sampled = np.repeat(
-                user_sparse_indices, self.num_neg + 1, axis=0)
-            item_sparse_sampled = self.data_info.item_sparse_unique[
-                item_indices_sampled]
-
-            assert len(user_sparse_sampled) == len(item_sparse_sampled), (
-                "num of user sampled must equal to num of item sampled")
-            # keep column names in original order
-            orig_cols = user_sparse_col + item_sparse_col
-            col_reindex = np.arange(len(orig_cols))[np.argsort(orig_cols)]
-            return np.concatenate(
-                [user_sparse_sampled, item_sparse_sampled], axis=-1
-            )[:, col_reindex]
-
-        elif user_sparse_col:
-            user_sparse_indices = np.take(
-                sparse_indices, user_sparse_col, axis=1)
-            user_sparse_sampled = np.repeat(
-                user_sparse_indices, self.num_neg + 1, axis=0)
-            return user_sparse_sampled
-
-        elif item_sparse_col:
-            item_sparse_sampled = self.data_info.item_sparse_unique[
-                item_indices_sampled]
-            return item_sparse_sampled
-
-    def _dense_indices_sampling(self, item_indices_sampled):
-        n_samples = len(item_indices_sampled)
-        user_dense_col = self.data_info.user_dense_col.index
-        item_dense_col = self.data_info.item_dense_col.index
-        total_dense_cols = len(user_dense_col) + len(item_dense_col)
-        return np.tile(np.arange(total_dense_cols), [n_samples, 1])
-
-    def _dense_values_sampling(self, dense_values, item_indices_sampled):
-        user_dense_col = self.data_info.user_dense_col.index
-        item_dense_col = self.data_info.item_dense_col.index
-
-        if user_dense_col and item_dense_col:
-            user_dense_values = np.take(dense_values, user_dense_col, axis=1)
-            user_dense_sampled = np.repeat(
-                user_dense_values, self.num_neg + 1, axis=0)
-            item_dense_sampled = self.data_info.item_dense_unique[
-                item_indices_sampled]
-
-            assert len(user_dense_sampled) == len(item_dense_sampled), (
-                "num of user sampled must equal to num of item sampled")
-            # keep column names in original order
-            orig_cols = user_dense_col + item_dense_col
-            col_reindex = np.arange(len(orig_cols))[np.argsort(orig_cols)]
-            return np.concatenate(
-                [user_dense_sampled, item_dense_sampled], axis=-1
-            )[:, col_reindex]
-
-        elif user_dense_col:
-            user_dense_values = np.take(dense_values, user_dense_col, axis=1)
-            user_dense_sampled = np.repeat(
-                user_dense_values, self.num_neg + 1, axis=0)
-            return user_dense_sampled
-
-        elif item_dense_col:
-            item_dense_sampled = self.data_info.item_dense_unique[
-                item_indices_sampled]
-            return item_dense_sampled
+    def _sparse_indices_sampling(self, user_sparse_indices,
+                                 item_indices_sampled):
+        return self._features_sampling(
+            user_sparse_indices,
+            self.data_info.item_sparse_unique,
+            item_indices_sampled,
+            self.data_info.sparse_col_pos
+        )
+
+    def _dense_values_sampling(self, user_dense_values, item_indices_sampled):
+        return self._features_sampling(
+            user_dense_values,
+            self.data_info.item_dense_unique,
+            item_indices_sampled,
+            self.data_info.dense_col_pos
+        )
+
+    @staticmethod
+    def _user_features(features, user_col):
+        return np.take(features, user_col, axis=1) if user_col else None
+
+    def _features_sampling(self, user_features, item_unique,
+                           item_indices_sampled, col_pos):
+        user_pos, item_pos = col_pos
+        if not len(user_pos) and not len(item_pos):
+            return None
+        elif not len(item_pos):
+            return np.repeat(user_features, self.num_neg + 1, axis=0)
+
+        item_sampled = item_unique[item_indices_sampled]
+        if not len(user_pos):
+            return item_sampled
+
+        # write user and item columns directly to their final positions,
+        # so no concatenation and reindexing is needed
+        n_cols = len(user_pos) + len(item_pos)
+        sampled = np.empty(
+            (len(item_indices_sampled), n_cols),
+            dtype=np.result_type(user_features, item_sampled)
+        )
+        # broadcast each user row over its positive and negative samples
+        # instead of materializing the repeated user features
+        sampled.reshape(-1, self.num_neg + 1, n_cols)[:, :, user_pos] = (
+            user_features[:, None, :])
+        sampled[:, item_pos] = item_sampled
+        return sampled
 
 
 class PairwiseSampling(SamplingBase):
-    def __init__(self, dataset, data_info, num_neg=1):
-        super(PairwiseSampling, self).__init__(dataset, data_info, num_neg)
+    def __init__(self, dataset, data_info, num_neg=1, seed=42):
+        super(PairwiseSampling, self).__init__(dataset, data_info, num_neg,
+                                               seed)
 
         if dataset.has_sampled:
             self.user_indices = dataset.user_indices_orig
@@ -265,31 +443,26 @@ class PairwiseSampling(SamplingBase):
 
     def __call__(self, shuffle=True, batch_size=None):
         if shuffle:
-            mask = np.random.permutation(range(self.data_size))
+            mask = self._rng.permutation(self.data_size)
             self.user_indices = self.user_indices[mask]
             self.item_indices = self.item_indices[mask]
 
-        user_consumed_set = {
-            u: set(items) for u, items in self.data_info.user_consumed.items()
-        }
         n_items = self.data_info.n_items
-        return self.sample_batch(user_consumed_set, n_items, batch_size)
+        return self.sample_batch(n_items, batch_size)
+
+    def _sample_neg_items(self, user_indices, n_items):
+        return self._sample_items_neg(
+            user_indices, 1, n_items, self._rng).ravel()
 
-    def sample_batch(self, user_consumed_set, n_items, batch_size):
+    def sample_batch(self, n_items, batch_size):
         for k in tqdm(range(0, self.data_size, batch_size),
                       desc="pair_sampling train"):
             batch_slice = slice(k, k + batch_size)
             batch_user_indices = self.user_indices[batch_slice]
             batch_item_indices_pos = self.item_indices[batch_slice]
 
-            batch_item_indices_neg = list()
-            for u in batch_user_indices:
-                item_neg = floor(n_items * random())
-                while item_neg in user_consumed_set[u]:
-                    item_neg = floor(n_items * random())
-                batch_item_indices_neg.append(item_neg)
-
-            batch_item_indices_neg = np.asarray(batch_item_indices_neg)
+            batch_item_indices_neg = self._sample_neg_items(
+                batch_user_indices, n_items)
             yield (
                 batch_user_indices,
                 batch_item_indices_pos,
@@ -298,15 +471,22 @@ class PairwiseSampling(SamplingBase):
 
 
 class PairwiseSamplingSeq(PairwiseSampling):
-    def __init__(self, dataset, data_info, num_neg=1, mode=None, num=None):
-        super(PairwiseSamplingSeq, self).__init__(dataset, data_info, num_neg)
+    def __init__(self, dataset, data_info, num_neg=1, mode=None, num=None,
+                 seed=42):
+        super(PairwiseSamplingSeq, self).__init__(dataset, data_info, num_neg,
+                                                  seed)
 
         self.seq_mode = mode
         self.seq_num = num
         self.n_items = data_info.n_items
         self.user_consumed = data_info.user_consumed
+        # only needed to tell positive items in `user_interacted_seq`,
+        # negative items are checked against the consumed CSR arrays
+        self.user_consumed_set = {
+            u: set(items) for u, items in self.user_consumed.items()
+        }
 
-    def sample_batch(self, user_consumed_set, n_items, batch_size):
+    def sample_batch(self, n_items, batch_size):
         for k in tqdm(range(0, self.data_size, batch_size),
                       desc="pair_sampling sequence train"):
             batch_slice = slice(k, k + batch_size)
@@ -323,17 +503,11 @@ class PairwiseSamplingSeq(PairwiseSampling):
                 self.n_items,
                 self.seq_mode,
                 self.seq_num,
-                user_consumed_set
+                self.user_consumed_set
             )
 
-            batch_item_indices_neg = list()
-            for u in batch_user_indices:
-                item_neg = floor(n_items * random())
-                while item_neg in user_consumed_set[u]:
-                    item_neg = floor(n_items * random())
-                batch_item_indices_neg.append(item_neg)
-
-            batch_item_indices_neg = np.asarray(batch_item_indices_neg)
+            batch_item_indices_neg = self._sample_neg_items(
+                batch_user_indices, n_items)
             yield (
                 batch_user_indices,
                 batch_item_indices_pos,
@@ -4,12 +4,12 @@ import sys
 
 from setuptools import setup, find_packages, Extension
 from setuptools import dist  # Install numpy right now
-dist.Distribution().fetch_build_eggs(['numpy>=1.15.4'])
+dist.Distribution().fetch_build_eggs(['numpy>=1.17.0'])
 
 try:
     import numpy as np
 except ImportError:
-    exit('Please install numpy>=1.15.4 first.')
+    exit('Please install numpy>=1.17.0 first.')
 
 try:
     from Cython.Build import cythonize
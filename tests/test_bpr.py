@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import tensorflow as tf
+
+from libreco.data import DatasetPure, split_by_ratio_chrono
+from libreco.algorithms import BPR
+
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "examples",
+                         "sample_data", "sample_movielens_rating.dat")
+
+
+@pytest.fixture
+def bpr_model():
+    data = pd.read_csv(DATA_PATH, sep="::",
+                       names=["user", "item", "label", "time"],
+                       engine="python").iloc[:5000]
+    train, _ = split_by_ratio_chrono(data, test_size=0.2)
+    train_data, data_info = DatasetPure.build_trainset(train)
+    tf.compat.v1.reset_default_graph()
+    model = BPR("ranking", data_info, embed_size=8, n_epochs=1, lr=3e-3,
+                batch_size=256, use_tf=True)
+    model.fit(train_data, verbose=0, shuffle=True)
+    return model
+
+
+def test_recommend_users_matches_recommend_user(bpr_model):
+    n_rec = 5
+    users = [0, 1, bpr_model.n_users - 1, -1]
+    batch_recs = bpr_model.recommend_users(users, n_rec)
+    assert batch_recs[-1] is None
+    for user in users[:-1]:
+        recs = bpr_model.recommend_user(user, n_rec)
+        # user 0 is a known user and must not be treated as unknown
+        assert recs is not None
+        assert [i for i, _ in recs] == [i for i, _ in batch_recs[user]]
+        np.testing.assert_allclose([p for _, p in recs],
+                                   [p for _, p in batch_recs[user]],
+                                   rtol=1e-5)